@@ -57,6 +57,7 @@ HIDDEN_IMPORTS = [
     "tqdm",
     "soundfile",
     "onnxruntime",
+    "orjson",
     "transcribe_cpp",
     "transcribe_cpp_native",
     "transcribe_cpp_native_cu12",
@@ -10,7 +10,10 @@ import json
 import os
 import hashlib
 import re
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
 from hf_cache_utils import (
     is_hf_repo_ready,
@@ -27,7 +30,21 @@ HF_ENDPOINT = os.environ.get("HF_ENDPOINT", DEFAULT_HF_ENDPOINT).rstrip("/")
 HF_FALLBACK_ENDPOINT = os.environ.get("HF_FALLBACK_ENDPOINT", DEFAULT_HF_FALLBACK_ENDPOINT).rstrip("/")
 COMPLETE_MANIFEST_NAME = ".light_whisper_complete.json"
 
+# 大文件下载中途断流很常见；换端点之前先在同一端点上指数退避重试。
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+_TRANSIENT_MAX_ATTEMPTS = 3
+_TRANSIENT_BACKOFF_S = 2.0
+
+# 大文件每变化 1% 就上报会刷出上百行 JSON（每行一次 flush 系统调用），
+# UI 上 100ms 一次已经足够流畅。
+_PROGRESS_EMIT_INTERVAL_S = 0.1
+
 _progress = {}
+_progress_lock = threading.Lock()
 _completed_count = 0
 _total_count = 0
 
@@ -38,32 +55,35 @@ _UNSATISFIED_RANGE_RE = re.compile(r"^bytes \*/(\d+)$")
 def _emit(model_type, stage, percent, error=None, message=None):
     global _completed_count
 
-    if stage == "downloading":
-        _progress[model_type] = percent
-    elif stage == "completed":
-        _progress[model_type] = 100
-        _completed_count += 1
-    elif stage == "error":
-        _progress[model_type] = 0
-        _completed_count += 1
-
-    overall = sum(_progress.values()) / _total_count if _total_count else 0
-
-    status = {
-        "stage": stage,
-        "model": model_type,
-        "progress": percent,
-        "overall_progress": round(overall, 1),
-        "completed": _completed_count,
-        "total": _total_count,
-    }
-    if error:
-        status["error"] = error
-    if message:
-        status["message"] = message
+    # 各模型在独立线程中下载，进度状态与 stdout 输出都要加锁保护。
+    with _progress_lock:
+        if stage == "downloading":
+            _progress[model_type] = percent
+        elif stage == "completed":
+            _progress[model_type] = 100
+            _completed_count += 1
+        elif stage == "error":
+            _progress[model_type] = 0
+            _completed_count += 1
+
+        overall = sum(_progress.values()) / _total_count if _total_count else 0
+
+        status = {
+            "stage": stage,
+            "model": model_type,
+            "progress": percent,
+            "overall_progress": round(overall, 1),
+            "completed": _completed_count,
+            "total": _total_count,
+        }
+        if error:
+            status["error"] = error
+        if message:
+            status["message"] = message
 
-    print(json.dumps(status, ensure_ascii=False))
-    sys.stdout.flush()
+        # 单次 write 代替 print 的"正文+换行"两次写入；紧凑分隔符少发些字节。
+        sys.stdout.write(json.dumps(status, ensure_ascii=False, separators=(",", ":")) + "\n")
+        sys.stdout.flush()
 
 
 def _candidate_endpoints():
@@ -255,6 +275,7 @@ def _download_file(
 
         current = downloaded
         last_pct = -1
+        last_emit = 0.0
         try:
             with open(tmp_path, mode) as f:
                 for chunk in resp.iter_content(chunk_size=1024 * 1024):
@@ -264,8 +285,12 @@ def _download_file(
                     current += len(chunk)
                     if total_size > 0:
                         pct = int(current * 100 / total_size)
-                        if pct != last_pct:
+                        now = time.monotonic()
+                        if pct != last_pct and (
+                            pct == 100 or now - last_emit >= _PROGRESS_EMIT_INTERVAL_S
+                        ):
                             last_pct = pct
+                            last_emit = now
                             _emit(model_type, "downloading", pct,
                                   message=f"[{file_idx}/{file_total}] {filename} {pct}%")
                 f.flush()
@@ -343,6 +368,10 @@ def _cleanup_locks(repo_id):
     cache_root = get_hf_cache_root()
     dir_name = "models--" + repo_id.replace("/", "--")
 
+    # 首次下载时仓库目录还不存在，一次 stat 就能跳过 blobs/locks 两趟扫描。
+    if not os.path.isdir(os.path.join(cache_root, dir_name)):
+        return
+
     import glob
     cleanup_incomplete_files(repo_id)
 
@@ -386,54 +415,78 @@ def download_model(model_config):
         else:
             _emit(model_type, "downloading", 0, message=f"正在获取 {model_name} 文件列表...")
 
-        try:
-            if required_files:
-                commit_hash = model_config["revision"]
-                files = required_files
+        for attempt in range(1, _TRANSIENT_MAX_ATTEMPTS + 1):
+            try:
+                _download_from_endpoint(model_config, endpoint)
+            except _TRANSIENT_ERRORS as e:
+                last_error = e
+                if attempt < _TRANSIENT_MAX_ATTEMPTS:
+                    wait = _TRANSIENT_BACKOFF_S * (2 ** (attempt - 1))
+                    _emit(
+                        model_type,
+                        "downloading",
+                        _progress.get(model_type, 0),
+                        message=f"网络中断，{wait:.0f} 秒后重试 ({attempt}/{_TRANSIENT_MAX_ATTEMPTS - 1})...",
+                    )
+                    time.sleep(wait)
+                    continue
+            except Exception as e:
+                last_error = e
             else:
-                commit_hash, files = _get_repo_info(model_name, endpoint)
-
-            # 构建 HF 缓存目录结构
-            cache_root = get_hf_cache_root()
-            dir_name = "models--" + model_name.replace("/", "--")
-            repo_dir = os.path.join(cache_root, dir_name)
-            snapshot_dir = os.path.join(repo_dir, "snapshots", commit_hash)
-            refs_dir = os.path.join(repo_dir, "refs")
-            os.makedirs(snapshot_dir, exist_ok=True)
-            os.makedirs(refs_dir, exist_ok=True)
-
-            # 写入 refs/main
-            with open(os.path.join(refs_dir, "main"), "w") as f:
-                f.write(commit_hash)
-
-            file_total = len(files)
-            for file_idx, file_info in enumerate(files, 1):
-                filename = file_info["rfilename"]
-                dest_path = os.path.join(snapshot_dir, filename.replace("/", os.sep))
-
-                _download_file(
-                    model_name,
-                    filename,
-                    dest_path,
-                    model_type,
-                    file_idx,
-                    file_total,
-                    endpoint,
-                    expected_size=file_info.get("size"),
-                    revision=commit_hash,
-                )
-
-            _write_completion_manifest(snapshot_dir, model_name, commit_hash, files)
-            _emit(model_type, "completed", 100, message=f"{model_name} 下载完成")
-            return {"success": True, "model": model_type, "endpoint": endpoint}
-        except Exception as e:
-            last_error = e
+                _emit(model_type, "completed", 100, message=f"{model_name} 下载完成")
+                return {"success": True, "model": model_type, "endpoint": endpoint}
+            break
 
     error_message = str(last_error) if last_error else "模型下载失败"
     _emit(model_type, "error", 0, error_message, message=f"{model_name} 下载失败: {error_message}")
     return {"success": False, "model": model_type, "error": error_message}
 
 
+def _download_from_endpoint(model_config, endpoint):
+    """从单个端点完成一个模型的全部文件下载与校验"""
+    model_name = model_config["name"]
+    model_type = model_config["type"]
+    required_files = model_config.get("files")
+
+    if required_files:
+        commit_hash = model_config["revision"]
+        files = required_files
+    else:
+        commit_hash, files = _get_repo_info(model_name, endpoint)
+
+    # 构建 HF 缓存目录结构
+    cache_root = get_hf_cache_root()
+    dir_name = "models--" + model_name.replace("/", "--")
+    repo_dir = os.path.join(cache_root, dir_name)
+    snapshot_dir = os.path.join(repo_dir, "snapshots", commit_hash)
+    refs_dir = os.path.join(repo_dir, "refs")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    os.makedirs(refs_dir, exist_ok=True)
+
+    # 写入 refs/main
+    with open(os.path.join(refs_dir, "main"), "w") as f:
+        f.write(commit_hash)
+
+    file_total = len(files)
+    for file_idx, file_info in enumerate(files, 1):
+        filename = file_info["rfilename"]
+        dest_path = os.path.join(snapshot_dir, filename.replace("/", os.sep))
+
+        _download_file(
+            model_name,
+            filename,
+            dest_path,
+            model_type,
+            file_idx,
+            file_total,
+            endpoint,
+            expected_size=file_info.get("size"),
+            revision=commit_hash,
+        )
+
+    _write_completion_manifest(snapshot_dir, model_name, commit_hash, files)
+
+
 def main(engine=None):
     global _total_count
 
@@ -467,16 +520,23 @@ def main(engine=None):
     else:
         raise ValueError(f"不支持的本地 ASR 引擎: {engine}")
 
+    # 提前建好缓存根目录：后续的缓存探测只需处理"目录存在但为空"一种情况，
+    # 网络盘上也避免对不存在路径反复 stat。
+    os.makedirs(get_hf_cache_root(), exist_ok=True)
+
     _total_count = len(models)
     for m in models:
         _progress[m["type"]] = 0
 
+    # 各仓库互相独立，并行下载让总耗时接近最大单模型耗时而非各模型之和。
     results = {}
-    for model_config in models:
-        result = download_model(model_config)
-        results[model_config["type"]] = result
-        if not result.get("success"):
-            break
+    with ThreadPoolExecutor(max_workers=len(models)) as executor:
+        futures = {
+            model_config["type"]: executor.submit(download_model, model_config)
+            for model_config in models
+        }
+        for model_type, future in futures.items():
+            results[model_type] = future.result()
 
     failed = [mt for mt, r in results.items() if not r["success"]]
 
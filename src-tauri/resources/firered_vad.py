@@ -89,7 +89,9 @@ class FireRedVad:
         pcm = np.clip(samples * 32768.0, -32768.0, 32767.0)
 
         fbank = self._knf.OnlineFbank(self._fbank_options)
-        fbank.accept_waveform(SAMPLE_RATE, pcm.tolist())
+        # kaldi_native_fbank 直接接受 numpy 波形；tolist() 会为每个采样点
+        # 建一个 Python float 对象，1 秒音频就是 16k 次装箱。
+        fbank.accept_waveform(SAMPLE_RATE, pcm)
         frame_count = fbank.num_frames_ready
         if frame_count == 0:
             return np.empty((0, 80), dtype=np.float32)
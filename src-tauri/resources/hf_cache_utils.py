@@ -4,6 +4,7 @@
 避免重复实现缓存路径和模型就绪检查逻辑。
 """
 
+import functools
 import os
 import json
 import hashlib
@@ -25,7 +26,7 @@ QWEN3_ASR_MODELS = {
     },
 }
 
-_WEIGHT_EXTS = (".pt", ".bin", ".safetensors", ".onnx", ".gguf")
+_WEIGHT_EXTS = frozenset({".pt", ".bin", ".safetensors", ".onnx", ".gguf"})
 _MIN_WEIGHT_SIZE = 1_000_000  # 与 Rust 端阈值一致
 COMPLETE_MANIFEST_NAME = ".light_whisper_complete.json"
 
@@ -35,24 +36,40 @@ def get_hf_cache_root():
 
     优先级：HF_HUB_CACHE（由 Rust 设置的自定义路径）> HF_HOME/hub > 默认
     """
-    hf_hub_cache = os.environ.get("HF_HUB_CACHE")
+    return _resolve_hf_cache_root(
+        os.environ.get("HF_HUB_CACHE"), os.environ.get("HF_HOME")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_hf_cache_root(hf_hub_cache, hf_home):
+    # expanduser 每次都要解析 $HOME；按环境变量组合缓存结果即可。
     if hf_hub_cache:
         return hf_hub_cache
-    hf_home = os.environ.get("HF_HOME")
     if hf_home:
         return os.path.join(hf_home, "hub")
     return os.path.join(os.path.expanduser("~"), ".cache", "huggingface", "hub")
 
 
+def _repo_dir(repo_id):
+    return os.path.join(get_hf_cache_root(), "models--" + repo_id.replace("/", "--"))
+
+
+# 状态轮询每次都会触发就绪检查；就绪结论在进程生命周期内不会回退
+# （用户删缓存需要重启应用才生效），因此只缓存 True，False 留待下载完成后复查。
+_ready_repos = set()
+
+
 def is_hf_repo_ready(repo_id):
     """检查 HuggingFace 模型是否已缓存且包含实际模型权重文件。
 
     仅检查目录结构不够——下载中途取消会留下空壳目录（refs/snapshots 存在但无权重文件），
     导致后续加载卡死。这里额外验证 snapshots 中存在 >1MB 的模型权重文件。
     """
-    cache_root = get_hf_cache_root()
-    dir_name = "models--" + repo_id.replace("/", "--")
-    repo_dir = os.path.join(cache_root, dir_name)
+    if repo_id in _ready_repos:
+        return True
+
+    repo_dir = _repo_dir(repo_id)
     if not os.path.isdir(repo_dir):
         return False
 
@@ -65,6 +82,7 @@ def is_hf_repo_ready(repo_id):
         if not os.path.isdir(snapshot_path):
             continue
         if _snapshot_matches_completion_manifest(snapshot_path) or _snapshot_matches_legacy_weight_check(snapshot_path):
+            _ready_repos.add(repo_id)
             return True
 
     return False
@@ -72,8 +90,7 @@ def is_hf_repo_ready(repo_id):
 
 def find_hf_snapshot_file(repo_id, filename):
     """Resolve one exact cached file without scanning unrelated quantizations."""
-    cache_root = get_hf_cache_root()
-    repo_dir = os.path.join(cache_root, "models--" + repo_id.replace("/", "--"))
+    repo_dir = _repo_dir(repo_id)
     snapshots_dir = os.path.join(repo_dir, "snapshots")
     if not os.path.isdir(snapshots_dir):
         return None
@@ -119,24 +136,25 @@ def find_hf_snapshot_file(repo_id, filename):
 
 def cleanup_incomplete_files(repo_id):
     """删除旧 huggingface_hub blob 临时文件，保留 snapshots 下可续传的 partial。"""
-    cache_root = get_hf_cache_root()
-    dir_name = "models--" + repo_id.replace("/", "--")
-    repo_dir = os.path.join(cache_root, dir_name)
-    blobs_dir = os.path.join(repo_dir, "blobs")
-    if not os.path.isdir(blobs_dir):
-        return 0
+    blobs_dir = os.path.join(_repo_dir(repo_id), "blobs")
 
     removed = 0
-    for root, _dirs, files in os.walk(blobs_dir):
-        for filename in files:
-            if not filename.endswith(".incomplete"):
-                continue
-            path = os.path.join(root, filename)
-            try:
-                os.remove(path)
-                removed += 1
-            except OSError:
-                pass
+    stack = [blobs_dir]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".incomplete"):
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
     return removed
 
 
@@ -174,7 +192,7 @@ def _snapshot_matches_completion_manifest(snapshot_path):
             return False
         if expected_sha256 and _sha256_file(path).lower() != expected_sha256.lower():
             return False
-        if rel_path.endswith(_WEIGHT_EXTS) and actual_size >= _MIN_WEIGHT_SIZE:
+        if os.path.splitext(rel_path)[1] in _WEIGHT_EXTS and actual_size >= _MIN_WEIGHT_SIZE:
             has_weight = True
 
     return has_weight
@@ -189,16 +207,27 @@ def _sha256_file(path):
 
 
 def _snapshot_matches_legacy_weight_check(snapshot_path):
+    # os.scandir 复用目录枚举时操作系统已返回的 stat 信息（Windows 上尤其明显），
+    # 避免 os.walk + getsize 对每个文件各发一次额外的 stat 系统调用。
     has_weight = False
-    for root, _dirs, files in os.walk(snapshot_path):
-        for f in files:
-            if f.endswith(".incomplete"):
-                return False
-            if f.endswith(_WEIGHT_EXTS):
-                filepath = os.path.join(root, f)
-                try:
-                    if os.path.getsize(filepath) >= _MIN_WEIGHT_SIZE:
-                        has_weight = True
-                except OSError:
+    stack = [snapshot_path]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return False
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if entry.name.endswith(".incomplete"):
                     return False
+                if not has_weight and os.path.splitext(entry.name)[1] in _WEIGHT_EXTS:
+                    try:
+                        if entry.stat().st_size >= _MIN_WEIGHT_SIZE:
+                            has_weight = True
+                    except OSError:
+                        return False
     return has_weight
@@ -3,11 +3,13 @@
 
 """Low-latency local Qwen3-ASR GGUF server backed by transcribe.cpp."""
 
+import gc
 import importlib.metadata
 import os
 import subprocess
 import time
-import traceback
+
+import numpy as np
 
 from firered_vad import FireRedVad
 
@@ -28,6 +30,21 @@ from hf_cache_utils import QWEN3_ASR_MODELS, find_hf_snapshot_file
 
 QWEN3_ASR_N_CTX = 32_768
 QWEN3_VAD_SAMPLE_RATE = 16_000
+# f16 是精度安全的默认值；q8_0 将 KV cache 减半、省带宽，
+# 显存紧张的机器可通过环境变量选用。
+QWEN3_ASR_KV_TYPES = ("f16", "q8_0", "f32")
+
+
+def _resolve_kv_type():
+    kv_type = os.environ.get("LIGHT_WHISPER_KV_TYPE", "f16")
+    if kv_type not in QWEN3_ASR_KV_TYPES:
+        logger.warning(
+            "不支持的 KV cache 类型: %s（可选 %s），回退 f16",
+            kv_type,
+            "/".join(QWEN3_ASR_KV_TYPES),
+        )
+        return "f16"
+    return kv_type
 
 
 class Qwen3ASRServer(BaseASRServer):
@@ -43,7 +60,10 @@ class Qwen3ASRServer(BaseASRServer):
         self.session = None
         self.vad_model = None
         self.backend = "cuda" if self.device == "cuda" else "auto"
+        self.kv_type = _resolve_kv_type()
         self._last_load_error = None
+        self._last_warmup = 0.0
+        self._version_cache = None
         self._total_inference_ms = 0.0
         self._total_vad_ms = 0.0
         self._vad_calls = 0
@@ -58,9 +78,14 @@ class Qwen3ASRServer(BaseASRServer):
         return "cpu"
 
     def _get_gpu_device_info(self):
+        # 状态每隔几秒轮询一次；设备名/显存总量不会变，nvidia-smi 子进程
+        # 只值得跑一次。加载后端切换（device 变化）时缓存自动失效。
+        if self._gpu_info_cache is not None and self._gpu_info_cache["device"] == self.device:
+            return dict(self._gpu_info_cache)
         info = {"device": self.device}
         if self.backend != "cuda":
-            return info
+            self._gpu_info_cache = info
+            return dict(info)
         query = subprocess.run(
             [
                 "nvidia-smi",
@@ -77,14 +102,14 @@ class Qwen3ASRServer(BaseASRServer):
             info["gpu_name"] = name
             info["gpu_memory_total"] = round(float(memory_mb) / 1024, 1)
         except (IndexError, ValueError):
-            pass
-        return info
+            # 查询失败不缓存，下次轮询重试。
+            return info
+        self._gpu_info_cache = info
+        return dict(info)
 
     def _cleanup_memory(self):
         # transcribe.cpp owns its CUDA allocations; torch.empty_cache() cannot
         # release them and importing torch here would add substantial overhead.
-        import gc
-
         gc.collect()
 
     def _get_model_repos(self):
@@ -120,7 +145,7 @@ class Qwen3ASRServer(BaseASRServer):
             try:
                 with self.stdout_suppressor.suppress():
                     model = transcribe_cpp.Model(model_path, backend=backend)
-                    session = model.session(kv_type="f16", n_ctx=QWEN3_ASR_N_CTX)
+                    session = model.session(kv_type=self.kv_type, n_ctx=QWEN3_ASR_N_CTX)
                 self.model = model
                 self.session = session
                 self.backend = backend
@@ -134,14 +159,13 @@ class Qwen3ASRServer(BaseASRServer):
 
     def _warmup_inference(self):
         try:
-            import numpy as np
-
             started = time.perf_counter()
             rng = np.random.default_rng(0)
             audio = rng.standard_normal(16_000).astype(np.float32) * 0.002
             self.vad_model.warmup()
             with self.stdout_suppressor.suppress():
                 self.session.run(audio, timestamps="none")
+            self._last_warmup = time.monotonic()
             logger.info(
                 "Qwen3-ASR 与 FireRedVAD 预热完成，耗时 %.3f 秒",
                 time.perf_counter() - started,
@@ -150,8 +174,6 @@ class Qwen3ASRServer(BaseASRServer):
             logger.warning("Qwen3-ASR 预热失败（首次识别可能偏慢）: %s", exc)
 
     def _filter_speech(self, audio):
-        import numpy as np
-
         started = time.perf_counter()
         chunks = self.vad_model.speech_timestamps(audio)
         vad_ms = (time.perf_counter() - started) * 1000
@@ -172,6 +194,20 @@ class Qwen3ASRServer(BaseASRServer):
         # phrase timing; only idle time before/after the utterance is removed.
         return np.ascontiguousarray(audio[start:end]), len(chunks), vad_ms
 
+    def prefetch(self):
+        """Re-touch model weights before a recording session starts.
+
+        After minutes of idling, mmap'd GGUF pages and GPU caches may have
+        been evicted; a dummy inference re-faults them so the first real
+        utterance doesn't pay that cost. Recently warmed sessions skip it.
+        """
+        if not self.initialized:
+            return self.initialize()
+        if time.monotonic() - self._last_warmup < 60:
+            return {"success": True, "message": "预热仍然有效", "engine": self.engine}
+        self._warmup_inference()
+        return {"success": True, "message": "预热完成", "engine": self.engine}
+
     def initialize(self):
         if self.initialized:
             return {"success": True, "message": "模型已初始化", "engine": self.engine}
@@ -206,8 +242,7 @@ class Qwen3ASRServer(BaseASRServer):
             self._close_runtime()
             self.vad_model = None
             self._last_load_error = str(exc)
-            logger.error("Qwen3-ASR 依赖加载失败: %s", exc)
-            logger.error(traceback.format_exc())
+            logger.exception("Qwen3-ASR 依赖加载失败: %s", exc)
             return {
                 "success": False,
                 "error": f"Qwen3-ASR 依赖加载失败: {exc}",
@@ -218,8 +253,7 @@ class Qwen3ASRServer(BaseASRServer):
             self._close_runtime()
             self.vad_model = None
             self._last_load_error = str(exc)
-            logger.error("Qwen3-ASR 初始化失败: %s", exc)
-            logger.error(traceback.format_exc())
+            logger.exception("Qwen3-ASR 初始化失败: %s", exc)
             return {
                 "success": False,
                 "error": f"Qwen3-ASR 初始化失败: {exc}",
@@ -231,7 +265,6 @@ class Qwen3ASRServer(BaseASRServer):
     def _resample(audio, source_rate):
         if source_rate == 16_000:
             return audio
-        import numpy as np
 
         target_length = int(round(len(audio) * 16_000 / source_rate))
         if target_length <= 0:
@@ -243,8 +276,6 @@ class Qwen3ASRServer(BaseASRServer):
         ).astype(np.float32)
 
     def _load_audio(self, audio_path, audio_base64, audio_format, sample_rate):
-        import numpy as np
-
         if audio_base64:
             audio, duration = decode_inline_audio(audio_base64, audio_format, sample_rate)
             if not isinstance(audio, np.ndarray):
@@ -253,15 +284,19 @@ class Qwen3ASRServer(BaseASRServer):
             audio = self._resample(audio, source_rate)
             return np.ascontiguousarray(audio, dtype=np.float32), duration, "memory"
 
-        if not audio_path or not os.path.exists(audio_path):
-            raise FileNotFoundError(f"音频文件不存在: {audio_path}")
+        if not audio_path:
+            raise FileNotFoundError("音频文件不存在: 未提供路径")
         import soundfile as sf
 
-        audio, source_rate = sf.read(
-            audio_path,
-            dtype="float32",
-            always_2d=True,
-        )
+        try:
+            audio, source_rate = sf.read(
+                audio_path,
+                dtype="float32",
+                always_2d=True,
+            )
+        except (OSError, RuntimeError) as exc:
+            # 不做 os.path.exists 预检：open 失败本身就是答案，少一次 stat。
+            raise FileNotFoundError(f"音频文件不存在或无法读取: {audio_path}") from exc
         audio = audio.mean(axis=1, dtype=np.float32)
         audio = self._resample(audio, source_rate)
         return np.ascontiguousarray(audio), len(audio) / 16_000.0, "path"
@@ -343,8 +378,7 @@ class Qwen3ASRServer(BaseASRServer):
                 "inference_ms": round(inference_ms, 3),
             }
         except Exception as exc:
-            logger.error("Qwen3-ASR 转录失败: %s", exc)
-            logger.error(traceback.format_exc())
+            logger.exception("Qwen3-ASR 转录失败: %s", exc)
             return {
                 "success": False,
                 "error": f"音频转录失败: {exc}",
@@ -373,9 +407,18 @@ class Qwen3ASRServer(BaseASRServer):
             },
         }
 
+    def _runtime_version(self):
+        """transcribe-cpp 的版本（含未安装状态）在进程内不变，只查一次元数据。"""
+        if self._version_cache is None:
+            try:
+                self._version_cache = (True, importlib.metadata.version("transcribe-cpp"))
+            except importlib.metadata.PackageNotFoundError as exc:
+                self._version_cache = (False, str(exc))
+        return self._version_cache
+
     def check_status(self):
-        try:
-            version = importlib.metadata.version("transcribe-cpp")
+        installed, version = self._runtime_version()
+        if installed:
             model_loaded = self.model is not None and self.session is not None
             return {
                 "success": True,
@@ -392,14 +435,13 @@ class Qwen3ASRServer(BaseASRServer):
                 },
                 **self._get_gpu_device_info(),
             }
-        except importlib.metadata.PackageNotFoundError as exc:
-            return {
-                "success": False,
-                "installed": False,
-                "initialized": False,
-                "error": f"Qwen3-ASR 依赖加载失败: {exc}",
-                "engine": self.engine,
-            }
+        return {
+            "success": False,
+            "installed": False,
+            "initialized": False,
+            "error": f"Qwen3-ASR 依赖加载失败: {version}",
+            "engine": self.engine,
+        }
 
 
 if __name__ == "__main__":
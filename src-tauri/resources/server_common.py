@@ -3,17 +3,22 @@
 
 """Python ASR server shared utilities."""
 
+import atexit
 import base64
 import contextlib
+import gc
 import io
 import logging
 import os
-import struct
+import queue
 import sys
 import tempfile
 import threading
+import wave
 from typing import Optional, Tuple
-from logging.handlers import RotatingFileHandler
+
+import numpy as np
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
 def _has_nvidia_gpu() -> bool:
@@ -73,42 +78,58 @@ def get_log_path(log_filename: str) -> str:
 
 
 def setup_rotating_logger(module_name: str, log_filename: str, service_name: str) -> logging.Logger:
-    """Initialize a rotating file logger + stderr stream logger."""
+    """Initialize a rotating file logger + stderr stream logger.
+
+    Handlers sit behind a QueueListener so timestamp formatting and the two
+    write syscalls happen on a drain thread instead of the transcription path.
+    """
     log_file_path = get_log_path(log_filename)
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler = RotatingFileHandler(
+        log_file_path,
+        encoding="utf-8",
+        maxBytes=5 * 1024 * 1024,  # 5MB
+        backupCount=3,
+    )
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # QueueHandler 侧只合并消息参数；时间戳等格式化留给 drain 线程的 handler。
     logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            RotatingFileHandler(
-                log_file_path,
-                encoding="utf-8",
-                maxBytes=5 * 1024 * 1024,  # 5MB
-                backupCount=3,
-            ),
-            logging.StreamHandler(sys.stderr),
-        ],
+        level=logging.INFO, format="%(message)s", handlers=[QueueHandler(log_queue)]
     )
     logger = logging.getLogger(module_name)
-    logger.info(f"{service_name}日志文件: {log_file_path}")
+    logger.info("%s日志文件: %s", service_name, log_file_path)
     return logger
 
 
 class StdoutSuppressor:
-    """Reference-counted stdout suppressor for noisy third-party libs."""
+    """Reference-counted stdout suppressor for noisy third-party libs.
+
+    Redirects fd 1 itself (not just sys.stdout), so printf from native
+    backends is silenced too and cannot corrupt the line protocol on stdout.
+    """
 
     def __init__(self) -> None:
         self._lock = threading.Lock()
         self._refcount = 0
-        self._stdout_original = None
-        self._stdout_devnull = None
+        # devnull fd 和备份的 stdout fd 都常驻：每次转录 open/close 一对
+        # syscall 没有意义，进程退出时由操作系统统一回收。
+        self._devnull_fd = os.open(os.devnull, os.O_WRONLY)
+        self._saved_stdout_fd = os.dup(1)
 
     @contextlib.contextmanager
     def suppress(self):
         with self._lock:
             if self._refcount == 0:
-                self._stdout_original = sys.stdout
-                self._stdout_devnull = open(os.devnull, "w")
-                sys.stdout = self._stdout_devnull
+                sys.stdout.flush()
+                os.dup2(self._devnull_fd, 1)
             self._refcount += 1
         try:
             yield
@@ -116,32 +137,59 @@ class StdoutSuppressor:
             with self._lock:
                 self._refcount -= 1
                 if self._refcount <= 0:
-                    sys.stdout = self._stdout_original
-                    if self._stdout_devnull:
-                        self._stdout_devnull.close()
-                    self._stdout_devnull = None
-                    self._stdout_original = None
+                    # 屏蔽期间 Python 层缓冲的输出也应落入 devnull，而不是
+                    # 在恢复后混进协议流。
+                    sys.stdout.flush()
+                    os.dup2(self._saved_stdout_fd, 1)
 
 
 def get_wav_duration_seconds(audio_path: str, logger: logging.Logger) -> float:
     """Read WAV duration from header quickly without decoding full audio."""
     try:
         with open(audio_path, "rb") as f:
-            riff = f.read(4)
-            if riff != b"RIFF":
+            # 标准布局（fmt 块紧随 WAVE、data 块在偏移 36）一次 read 即可；
+            # 录音管线生成的文件都是这种布局。
+            header = f.read(44)
+            if len(header) < 44 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
                 raise ValueError("非 WAV 格式")
-            f.seek(28)
-            byte_rate = struct.unpack("<I", f.read(4))[0]
-            f.seek(40)
-            data_size = struct.unpack("<I", f.read(4))[0]
+            if header[12:16] == b"fmt " and header[36:40] == b"data":
+                byte_rate = int.from_bytes(header[28:32], "little")
+                data_size = int.from_bytes(header[40:44], "little")
+            else:
+                byte_rate, data_size = _walk_wav_chunks(f)
         if byte_rate <= 0:
             raise ValueError(f"无效的 byte rate: {byte_rate}")
         return data_size / byte_rate
     except Exception as e:
-        logger.warning(f"从 WAV header 获取音频时长失败: {e}")
+        logger.warning("从 WAV header 获取音频时长失败: %s", e)
         return 0.0
 
 
+def _walk_wav_chunks(f) -> Tuple[int, int]:
+    """Locate fmt/data chunks in non-canonical WAV files (extra LIST/fact chunks)."""
+    byte_rate = data_size = None
+    f.seek(12)
+    while byte_rate is None or data_size is None:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[:4]
+        chunk_size = int.from_bytes(chunk_header[4:8], "little")
+        padded_size = chunk_size + (chunk_size & 1)
+        if chunk_id == b"fmt ":
+            fmt_body = f.read(min(chunk_size, 16))
+            if len(fmt_body) >= 12:
+                byte_rate = int.from_bytes(fmt_body[8:12], "little")
+            f.seek(padded_size - len(fmt_body), 1)
+        else:
+            if chunk_id == b"data":
+                data_size = chunk_size
+            f.seek(padded_size, 1)
+    if byte_rate is None or data_size is None:
+        raise ValueError("WAV 头缺少 fmt/data 块")
+    return byte_rate, data_size
+
+
 def decode_inline_audio(
     audio_base64: str,
     audio_format: Optional[str],
@@ -162,8 +210,6 @@ def decode_inline_audio(
             raise ValueError("PCM 内存音频缺少有效采样率")
         if len(audio_bytes) % 2 != 0:
             raise ValueError("PCM s16le 数据字节数必须为偶数")
-        import numpy as np
-
         samples = np.frombuffer(audio_bytes, dtype="<i2")
         duration = len(samples) / float(sample_rate)
         audio = samples.astype(np.float32) / 32768.0
@@ -188,15 +234,33 @@ def decode_inline_audio(
 
 
 def wave_open(buffer: io.BytesIO):
-    import wave
-
     buffer.seek(0)
     return wave.open(buffer, "rb")
 
 
 import json
 import signal
-import traceback
+
+try:
+    # C 实现的编解码器；转录结果里成段的中文文本用 stdlib json 序列化
+    # 是单条命令开销的大头。
+    import orjson
+
+    def _json_dumps_line(obj):
+        return orjson.dumps(obj) + b"\n"
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps_line(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    _json_loads = json.loads
+
+
+def _write_json_line(obj) -> None:
+    """以单行 JSON 向宿主（Rust 端）写回一条响应。"""
+    sys.stdout.buffer.write(_json_dumps_line(obj))
+    sys.stdout.flush()
 
 
 CLEANUP_EVERY_N = 20
@@ -223,6 +287,8 @@ class BaseASRServer:
         self.total_audio_duration = 0.0
         self.device = self._detect_device()
         self.stdout_suppressor = StdoutSuppressor()
+        self._cleanup_pending = threading.Event()
+        self._gpu_info_cache = None
 
         signal.signal(signal.SIGTERM, self._signal_handler)
         signal.signal(signal.SIGINT, self._signal_handler)
@@ -239,32 +305,46 @@ class BaseASRServer:
             if torch.cuda.is_available():
                 gpu_name = torch.cuda.get_device_name(0)
                 gpu_mem = torch.cuda.get_device_properties(0).total_memory / (1024**3)
-                self.logger.info(f"检测到 NVIDIA GPU: {gpu_name} ({gpu_mem:.1f}GB)，使用 CUDA 加速")
+                self.logger.info("检测到 NVIDIA GPU: %s (%.1fGB)，使用 CUDA 加速", gpu_name, gpu_mem)
                 return "cuda"
             else:
                 self.logger.info("CUDA 不可用，使用 CPU 推理")
                 return "cpu"
         except ImportError as e:
-            self.logger.warning(f"PyTorch 导入失败: {e}，使用 CPU 推理")
+            self.logger.warning("PyTorch 导入失败: %s，使用 CPU 推理", e)
             return "cpu"
         except Exception as e:
-            self.logger.warning(f"GPU 检测失败: {e}，回退到 CPU 推理")
+            self.logger.warning("GPU 检测失败: %s，回退到 CPU 推理", e)
             return "cpu"
 
     def _setup_runtime_environment(self) -> None:
         try:
             os.environ["HF_HUB_OFFLINE"] = "1"
-            cpu_count = os.cpu_count() or 4
+            try:
+                # 容器/亲和性受限时 cpu_count() 报告的是宿主机核数；
+                # 以实际可调度的核数为准（Windows 无此接口）。
+                cpu_count = len(os.sched_getaffinity(0))
+            except AttributeError:
+                cpu_count = os.cpu_count() or 4
             thread_count = max(4, cpu_count - 2)
+            # OMP/MKL/OpenBLAS 各自独立读线程数；只设 OMP 时其余线程池仍会
+            # 各开满 cpu_count 个线程，互相争抢核心。
             os.environ["OMP_NUM_THREADS"] = str(thread_count)
+            os.environ.setdefault("MKL_NUM_THREADS", str(thread_count))
+            os.environ.setdefault("OPENBLAS_NUM_THREADS", str(thread_count))
+            # 推理期间会短时间分配大量临时对象；默认 700 的 gen0 阈值会让
+            # 自动循环 GC 频繁打断转录线程，定期清理已由 _maybe_cleanup 兜底。
+            gc.set_threshold(50_000, 20, 20)
             self.logger.info(
-                f"运行时环境变量设置完成，HF_HUB_OFFLINE=1, OMP_NUM_THREADS={thread_count} (CPU核心数: {cpu_count})"
+                "运行时环境变量设置完成，HF_HUB_OFFLINE=1, OMP_NUM_THREADS=%s (CPU核心数: %s)",
+                thread_count,
+                cpu_count,
             )
         except Exception as e:
-            self.logger.warning(f"环境设置失败: {e}")
+            self.logger.warning("环境设置失败: %s", e)
 
     def _signal_handler(self, signum, frame) -> None:
-        self.logger.info(f"收到信号 {signum}，准备退出...")
+        self.logger.info("收到信号 %s，准备退出...", signum)
         self.running = False
 
     def _get_audio_duration(self, audio_path: str) -> float:
@@ -274,24 +354,39 @@ class BaseASRServer:
 
     def _cleanup_memory(self) -> None:
         try:
-            import gc
             gc.collect()
             if self.device == "cuda":
-                import torch
-                torch.cuda.empty_cache()
+                # 只在引擎已经用上 torch 时清它的分配器缓存；
+                # 不为了清理而把 2GB 的 torch 拉进进程。
+                torch = sys.modules.get("torch")
+                if torch is not None:
+                    torch.cuda.empty_cache()
             self.logger.info("内存清理完成")
         except Exception as e:
-            self.logger.warning(f"内存清理失败: {e}")
+            self.logger.warning("内存清理失败: %s", e)
 
     def _maybe_cleanup(self, duration: float) -> None:
         """Run periodic memory cleanup after transcription (in background thread)."""
         if self.transcription_count % CLEANUP_EVERY_N == 0 or duration > 120:
-            import threading
-            threading.Thread(target=self._cleanup_memory, daemon=True).start()
-            self.logger.info(f"已完成 {self.transcription_count} 次转录，后台执行内存清理")
+            # 上一轮清理还没结束就不再叠加新线程；gc.collect 并发跑只会互相拖慢。
+            if self._cleanup_pending.is_set():
+                return
+            self._cleanup_pending.set()
+            threading.Thread(target=self._background_cleanup, daemon=True).start()
+            self.logger.info("已完成 %d 次转录，后台执行内存清理", self.transcription_count)
+
+    def _background_cleanup(self) -> None:
+        try:
+            self._cleanup_memory()
+        finally:
+            self._cleanup_pending.clear()
 
     def _get_gpu_device_info(self) -> dict:
         """Return device/gpu_name/gpu_memory_total dict for status responses."""
+        # 设备名和显存总量在进程内不会变，没必要每次状态轮询都重新查询；
+        # 查询失败不缓存，留给下一次轮询重试。
+        if self._gpu_info_cache is not None and self._gpu_info_cache["device"] == self.device:
+            return dict(self._gpu_info_cache)
         info = {"device": self.device}
         if self.device == "cuda":
             try:
@@ -301,8 +396,9 @@ class BaseASRServer:
                     torch.cuda.get_device_properties(0).total_memory / (1024**3), 1
                 )
             except Exception:
-                pass
-        return info
+                return info
+        self._gpu_info_cache = info
+        return dict(info)
 
     # ------------------------------------------------------------------
     # Hooks for subclasses
@@ -312,6 +408,14 @@ class BaseASRServer:
         """Return list of HF repo IDs to check before auto-init."""
         raise NotImplementedError
 
+    def prefetch(self) -> dict:
+        """Warm model caches while the user is still setting up a recording.
+
+        The host sends this on hotkey press, before audio exists. Default is
+        a no-op; engines with a meaningful warmup path should override.
+        """
+        return {"success": True, "message": "无需预热", "engine": self.engine}
+
     def initialize(self) -> dict:
         raise NotImplementedError
 
@@ -337,12 +441,12 @@ class BaseASRServer:
     # ------------------------------------------------------------------
 
     def run(self) -> None:
-        self.logger.info(f"{self.engine} 服务器启动")
+        self.logger.info("%s 服务器启动", self.engine)
 
         from hf_cache_utils import get_hf_cache_root, is_hf_repo_ready
 
         hf_cache = get_hf_cache_root()
-        self.logger.info(f"HuggingFace 缓存根目录: {hf_cache}")
+        self.logger.info("HuggingFace 缓存根目录: %s", hf_cache)
 
         model_repos = self._get_model_repos()
         missing = [r for r in model_repos if not is_hf_repo_ready(r)]
@@ -351,7 +455,7 @@ class BaseASRServer:
             self.logger.info("模型文件存在，开始初始化")
             init_result = self.initialize()
         else:
-            self.logger.info(f"模型文件不存在或不完整：{', '.join(missing)}，跳过初始化")
+            self.logger.info("模型文件不存在或不完整：%s，跳过初始化", ", ".join(missing))
             init_result = {
                 "success": False,
                 "error": "模型文件未下载，请先下载模型",
@@ -359,14 +463,49 @@ class BaseASRServer:
                 "engine": self.engine,
             }
 
-        print(json.dumps(init_result, ensure_ascii=False))
-        sys.stdout.flush()
+        _write_json_line(init_result)
+
+        # 读线程只做 blocking readline 并塞进有界队列：推理占用主线程时，
+        # 宿主管道里的下一条命令已经被读出等待。响应仍全部由主线程写出，
+        # 保证与请求同序。队列有界，宿主不会无限堆积待办命令。
+        command_queue: queue.Queue = queue.Queue(maxsize=8)
+        _eof = object()
+
+        def _read_stdin() -> None:
+            # 用 os.read 在裸 fd 上读：不经过文本层（_json_loads 接受 bytes），
+            # 也不持有 BufferedReader 的锁——守护线程阻塞在 readline 上会让
+            # 解释器退出时因拿不到该锁而 abort。
+            fd = sys.stdin.fileno()
+            pending = bytearray()
+            while True:
+                try:
+                    chunk = os.read(fd, 65536)
+                except OSError:
+                    chunk = b""
+                if not chunk:
+                    if pending:
+                        command_queue.put(bytes(pending))
+                    command_queue.put(_eof)
+                    return
+                pending += chunk
+                while True:
+                    newline = pending.find(b"\n")
+                    if newline < 0:
+                        break
+                    command_queue.put(bytes(pending[:newline]))
+                    del pending[: newline + 1]
+
+        threading.Thread(target=_read_stdin, daemon=True, name="stdin-reader").start()
 
         while self.running:
             request_id = None
             try:
-                line = sys.stdin.readline()
-                if not line:
+                try:
+                    # 带超时取件，信号把 self.running 置 False 后能及时退出。
+                    line = command_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if line is _eof:
                     break
 
                 line = line.strip()
@@ -374,12 +513,10 @@ class BaseASRServer:
                     continue
 
                 try:
-                    command = json.loads(line)
-                except json.JSONDecodeError:
+                    command = _json_loads(line)
+                except ValueError:
                     # 无 request_id 可回传——JSON 解析就失败了。Rust 端按旧协议兼容。
-                    result = {"success": False, "error": "无效的JSON命令"}
-                    print(json.dumps(result, ensure_ascii=False))
-                    sys.stdout.flush()
+                    _write_json_line({"success": False, "error": "无效的JSON命令"})
                     continue
 
                 # Rust 端给每条命令打的 request_id；所有响应必须原样回传，
@@ -403,6 +540,8 @@ class BaseASRServer:
                     result = self.check_status()
                 elif action == "stats":
                     result = {"success": True, "stats": self.get_performance_stats()}
+                elif action == "prefetch":
+                    result = self.prefetch()
                 elif action == "cleanup":
                     self._cleanup_memory()
                     result = {"success": True, "message": "内存清理完成"}
@@ -410,28 +549,28 @@ class BaseASRServer:
                     result = {"success": True, "message": "服务器退出"}
                     if request_id is not None and isinstance(result, dict):
                         result["request_id"] = request_id
-                    print(json.dumps(result, ensure_ascii=False))
-                    sys.stdout.flush()
+                    _write_json_line(result)
                     break
                 else:
                     result = {"success": False, "error": f"未知命令: {action}"}
 
                 if request_id is not None and isinstance(result, dict):
                     result["request_id"] = request_id
-                print(json.dumps(result, ensure_ascii=False))
-                sys.stdout.flush()
+                _write_json_line(result)
 
             except KeyboardInterrupt:
                 break
             except Exception as e:
+                # 完整 traceback 进文件日志即可；Rust 端从不读它，塞进 IPC
+                # 响应只会让每个错误多编码几十 KB。
+                self.logger.exception("命令处理失败: %s", e)
                 error_result = {
                     "success": False,
                     "error": str(e),
-                    "traceback": traceback.format_exc(),
+                    "type": type(e).__name__,
                 }
                 if request_id is not None:
                     error_result["request_id"] = request_id
-                print(json.dumps(error_result, ensure_ascii=False))
-                sys.stdout.flush()
+                _write_json_line(error_result)
 
-        self.logger.info(f"{self.engine} 服务器退出")
+        self.logger.info("%s 服务器退出", self.engine)
@@ -594,8 +594,49 @@ class ModelDownloadAtomicityTests(unittest.TestCase):
             self.assertTrue(os.path.exists(snapshot_incomplete))
             self.assertTrue(os.path.exists(complete_file))
 
+    def test_transient_connection_error_retries_same_endpoint_before_mirror(self):
+        import requests as requests_lib
+
+        attempts = []
+
+        def flaky_download(*args, **kwargs):
+            attempts.append(args)
+            if len(attempts) == 1:
+                raise requests_lib.exceptions.ConnectionError("reset by peer")
+
+        with (
+            mock.patch.object(download_models, "_cleanup_locks"),
+            mock.patch.object(download_models, "is_hf_repo_ready", return_value=False),
+            mock.patch.object(download_models, "get_hf_cache_root") as cache_root,
+            tempfile.TemporaryDirectory() as tmp,
+        ):
+            cache_root.return_value = tmp
+            with (
+                mock.patch.object(
+                    download_models,
+                    "_get_repo_info",
+                    return_value=("commit", [{"rfilename": "model.bin", "size": 10}]),
+                ),
+                mock.patch.object(download_models, "_download_file", side_effect=flaky_download),
+                mock.patch.object(download_models, "_write_completion_manifest"),
+                mock.patch.object(download_models, "_emit"),
+                mock.patch.object(download_models.time, "sleep") as fake_sleep,
+            ):
+                result = download_models.download_model({"name": "org/model", "type": "asr"})
+
+        self.assertTrue(result["success"])
+        self.assertEqual(
+            len(attempts),
+            2,
+            "a transient connection error must be retried on the same endpoint "
+            "instead of failing over to the mirror immediately",
+        )
+        fake_sleep.assert_called_once()
+
     def test_qwen_download_is_pinned_to_one_q8_file(self):
         with (
+            tempfile.TemporaryDirectory() as cache_root,
+            mock.patch.object(download_models, "get_hf_cache_root", return_value=cache_root),
             mock.patch.object(
                 download_models,
                 "download_model",
@@ -1,6 +1,7 @@
 import base64
 import os
 import sys
+import time
 import types
 import unittest
 from unittest import mock
@@ -204,6 +205,49 @@ class Qwen3ASRServerTests(unittest.TestCase):
         self.assertEqual(result["speech_duration"], 0.8)
         self.assertTrue(server.check_status()["models"]["vad"])
 
+    def test_kv_type_env_override_with_invalid_fallback(self):
+        with mock.patch.dict(os.environ, {"LIGHT_WHISPER_KV_TYPE": "q8_0"}):
+            server = qwen3_asr_server.Qwen3ASRServer(engine="qwen3-asr-0.6b")
+        self.assertEqual(server.kv_type, "q8_0")
+
+        with mock.patch.dict(os.environ, {"LIGHT_WHISPER_KV_TYPE": "int4"}):
+            server = qwen3_asr_server.Qwen3ASRServer(engine="qwen3-asr-0.6b")
+        self.assertEqual(server.kv_type, "f16")
+
+    def test_prefetch_rewarms_only_when_stale(self):
+        fake_module = types.SimpleNamespace(Model=FakeModel)
+        with (
+            mock.patch.object(
+                qwen3_asr_server.Qwen3ASRServer, "_detect_device", return_value="cuda"
+            ),
+            mock.patch.object(
+                qwen3_asr_server.Qwen3ASRServer,
+                "_resolve_model_path",
+                return_value="model.gguf",
+            ),
+            mock.patch.object(
+                qwen3_asr_server.Qwen3ASRServer, "_warmup_inference"
+            ) as warmup,
+            mock.patch.object(
+                qwen3_asr_server,
+                "FireRedVad",
+                return_value=FakeVad([{"start": 0, "end": 16_000}]),
+            ),
+            mock.patch.dict(sys.modules, {"transcribe_cpp": fake_module}),
+        ):
+            server = qwen3_asr_server.Qwen3ASRServer(engine="qwen3-asr-0.6b")
+            self.assertTrue(server.initialize()["success"])
+
+            server._last_warmup = time.monotonic()
+            fresh = server.prefetch()
+            server._last_warmup = time.monotonic() - 120
+            stale = server.prefetch()
+
+        self.assertTrue(fresh["success"])
+        self.assertTrue(stale["success"])
+        # initialize() warms once; only the stale prefetch warms again.
+        self.assertEqual(warmup.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+import io
+import logging
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from server_common import get_wav_duration_seconds
+
+logger = logging.getLogger(__name__)
+
+
+def write_canonical_wav(path, seconds, sample_rate=16_000):
+    with wave.open(path, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+def write_wav_with_list_chunk(path, seconds, sample_rate=16_000):
+    """WAV with a LIST chunk between fmt and data, as some editors emit."""
+    data = b"\x00\x00" * int(seconds * sample_rate)
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    list_body = b"INFOISFT\x06\x00\x00\x00light\x00"
+    body = io.BytesIO()
+    body.write(b"WAVE")
+    body.write(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+    body.write(b"LIST" + struct.pack("<I", len(list_body)) + list_body)
+    body.write(b"data" + struct.pack("<I", len(data)) + data)
+    payload = body.getvalue()
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", len(payload)) + payload)
+
+
+class WavDurationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "clip.wav")
+
+    def test_canonical_header_duration(self):
+        write_canonical_wav(self.path, seconds=1.5)
+        self.assertAlmostEqual(get_wav_duration_seconds(self.path, logger), 1.5)
+
+    def test_non_canonical_layout_falls_back_to_chunk_walk(self):
+        write_wav_with_list_chunk(self.path, seconds=2.0)
+        self.assertAlmostEqual(get_wav_duration_seconds(self.path, logger), 2.0)
+
+    def test_non_wav_input_returns_zero(self):
+        with open(self.path, "wb") as f:
+            f.write(b"ID3\x04not audio header data at all........")
+        self.assertEqual(get_wav_duration_seconds(self.path, logger), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()